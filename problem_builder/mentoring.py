@@ -51,7 +51,7 @@ from problem_builder.table import MentoringTableBlock
 
 from .message import MentoringMessageBlock, get_message_label
 from .mixins import (ExpandStaticURLMixin, MessageParentMixin, QuestionMixin,
-                     StepParentMixin, StudentViewUserStateMixin,
+                     StepIndexMixin, StepParentMixin, StudentViewUserStateMixin,
                      StudentViewUserStateResultsTransformerMixin, TranslationContentMixin,
                      XBlockWithTranslationServiceMixin, _normalize_id)
 from .step_review import ReviewStepBlock
@@ -791,7 +791,7 @@ class MentoringBlock(
 
 
 class MentoringWithExplicitStepsBlock(BaseMentoringBlock, StudioContainerWithNestedXBlocksMixin,
-                                      I18NService):
+                                      StepIndexMixin, I18NService):
     """
     An XBlock providing mentoring capabilities with explicit steps
     """
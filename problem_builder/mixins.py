@@ -1,7 +1,7 @@
 import json
+from functools import lru_cache
 
 import pkg_resources
-import six
 import webob
 from django import utils
 from lazy import lazy
@@ -12,7 +12,7 @@ from xblock.fragment import Fragment
 from xblockutils.helpers import child_isinstance
 from xblockutils.resources import ResourceLoader
 
-from problem_builder.tests.unit.utils import DateTimeEncoder
+from .utils import DateTimeEncoder
 
 loader = ResourceLoader(__name__)
 
@@ -22,10 +22,17 @@ def _(text):
     return text
 
 
+def _identity(value):
+    return value
+
+
+@lru_cache(maxsize=4096)
 def _normalize_id(key):
     """
     Helper method to normalize a key to avoid issues where some keys have version/branch and others don't.
     e.g. self.scope_ids.usage_id != self.runtime.get_block(self.scope_ids.usage_id).scope_ids.usage_id
+
+    Keys are immutable, so results are cached to avoid creating new key objects on every tree walk.
     """
     if hasattr(key, "for_branch"):
         key = key.for_branch(None)
@@ -60,17 +67,40 @@ class EnumerableChildMixin(XBlockWithTranslationServiceMixin):
         # parent's children.
         raise NotImplementedError("Should be overridden in child class")
 
+    @lazy
+    def normalized_usage_id(self):
+        """ Get the usage_id of this block without version/branch, as used in the parent's step_ids """
+        return _normalize_id(self.scope_ids.usage_id)
+
+    @lazy
+    def sibling_index_map(self):
+        """
+        Get a dict mapping the usage_id of each sibling to its (zero-based) position.
+
+        If a sibling is listed more than once, its first position is used.
+        """
+        index_map = {}
+        for index, sibling_id in enumerate(self.siblings):
+            index_map.setdefault(sibling_id, index)
+        return index_map
+
     @lazy
     def step_number(self):
-        return list(self.siblings).index(_normalize_id(self.scope_ids.usage_id)) + 1
+        try:
+            return self.sibling_index_map[self.normalized_usage_id] + 1
+        except KeyError:
+            raise self._missing_from_parent_error()
 
     @lazy
     def lonely_child(self):
-        if _normalize_id(self.scope_ids.usage_id) not in self.siblings:
-            message = u"{child_caption}'s parent should contain {child_caption}".format(child_caption=self.CAPTION)
-            raise ValueError(message, self, self.siblings)
+        if self.normalized_usage_id not in self.sibling_index_map:
+            raise self._missing_from_parent_error()
         return len(self.siblings) == 1
 
+    def _missing_from_parent_error(self):
+        message = u"{child_caption}'s parent should contain {child_caption}".format(child_caption=self.CAPTION)
+        return ValueError(message, self, self.siblings)
+
     @property
     def display_name_with_default(self):
         """ Get the title/display_name of this question. """
@@ -83,7 +113,25 @@ class EnumerableChildMixin(XBlockWithTranslationServiceMixin):
         return self._(self.CAPTION)
 
 
-class StepParentMixin:
+class StepIndexMixin:
+    """
+    An XBlock mixin for a parent block that numbers the children listed in its `step_ids`
+    """
+
+    @lazy
+    def step_index_map(self):
+        """
+        Get a dict mapping the usage_id of each step to its (zero-based) position
+
+        If a step is listed more than once, its first position is used.
+        """
+        index_map = {}
+        for index, step_id in enumerate(self.step_ids):
+            index_map.setdefault(step_id, index)
+        return index_map
+
+
+class StepParentMixin(StepIndexMixin):
     """
     An XBlock mixin for a parent block containing Step children
     """
@@ -108,23 +156,52 @@ class MessageParentMixin:
     An XBlock mixin for a parent block containing MentoringMessageBlock children
     """
 
-    def get_message_content(self, message_type, or_default=False):
+    @lazy
+    def messages_by_type(self):
+        """
+        Get the MentoringMessageBlock children of this block, keyed by message type.
+
+        If several messages have the same type, the first one is used.
+        """
         from problem_builder.message import MentoringMessageBlock  # Import here to avoid circular dependency
+        messages = {}
         for child_id in self.children:
             if child_isinstance(self, child_id, MentoringMessageBlock):
                 child = self.runtime.get_block(child_id)
-                if child.type == message_type:
-                    content = child.content
-                    if getattr(self.runtime, 'replace_jump_to_id_urls', None) is not None:
-                        content = self.runtime.replace_jump_to_id_urls(content)
-                    return content
+                messages.setdefault(child.type, child)
+        return messages
+
+    def get_message_content(self, message_type, or_default=False):
+        from problem_builder.message import MentoringMessageBlock  # Import here to avoid circular dependency
+        child = self.messages_by_type.get(message_type)
+        if child is not None:
+            content = child.content
+            # Not cached on the block: the runtime can be swapped out (e.g. between LMS and Studio views)
+            if getattr(self.runtime, 'replace_jump_to_id_urls', None) is not None:
+                content = self.runtime.replace_jump_to_id_urls(content)
+            return content
         if or_default:
             # Return the default value since no custom message is set.
             # Note the WYSIWYG editor usually wraps the .content HTML in a <p> tag so we do the same here.
             return '<p>{}</p>'.format(MentoringMessageBlock.MESSAGE_TYPES[message_type]['default'])
 
 
-class QuestionMixin(EnumerableChildMixin):
+class StepChildMixin(EnumerableChildMixin):
+    """
+    An XBlock mixin for a child block numbered among the `step_ids` of its parent
+    """
+
+    @lazy
+    def siblings(self):
+        return self.get_parent().step_ids
+
+    @lazy
+    def sibling_index_map(self):
+        """ Use the parent's map, so that it is built once and shared by all siblings """
+        return self.get_parent().step_index_map
+
+
+class QuestionMixin(StepChildMixin):
     """
     An XBlock mixin for a child block that is a "Step".
 
@@ -155,10 +232,6 @@ class QuestionMixin(EnumerableChildMixin):
         enforce_type=True
     )
 
-    @lazy
-    def siblings(self):
-        return self.get_parent().step_ids
-
     def author_view(self, context):
         context = context.copy() if context else {}
         context['hide_header'] = True
@@ -206,11 +279,13 @@ class StudentViewUserStateMixin:
 
         result = {}
         transforms = self.transforms()
-        for _, field in six.iteritems(self.fields):
-            # Only insert fields if their scopes and field names match
-            if field.scope in self.INCLUDE_SCOPES and field.name in self.USER_STATE_FIELDS:
-                transformer = transforms.get(field.name, lambda value: value)
-                result[field.name] = transformer(field.read_from(self))
+        # USER_STATE_FIELDS is usually much shorter than self.fields, so look its fields up directly
+        for field_name in self.USER_STATE_FIELDS:
+            field = self.fields.get(field_name)
+            # Only insert fields if their scopes match
+            if field is not None and field.scope in self.INCLUDE_SCOPES:
+                transformer = transforms.get(field_name, _identity)
+                result[field_name] = transformer(field.read_from(self))
 
         if getattr(self, "has_children", False):
             components = {}
@@ -162,14 +162,21 @@ class QuestionnaireAbstractBlock(
                 tips.append(self.runtime.get_block(child_id))
         return tips
 
+    def get_submission_display_map(self):
+        """
+        Get a dict mapping each choice value to its human-readable version
+        """
+        display_map = {}
+        for choice in self.custom_choices:
+            # If several choices have the same value, the first one is used
+            display_map.setdefault(choice.value, choice.content)
+        return display_map
+
     def get_submission_display(self, submission):
         """
         Get the human-readable version of a submission value
         """
-        for choice in self.custom_choices:
-            if choice.value == submission:
-                return choice.content
-        return submission
+        return self.get_submission_display_map().get(submission, submission)
 
     def get_author_edit_view_fragment(self, context):
         fragment = super(QuestionnaireAbstractBlock, self).author_edit_view(context)
@@ -21,7 +21,6 @@
 import logging
 
 import six
-from lazy.lazy import lazy
 from xblock.core import XBlock
 from xblock.fields import List, Scope, String
 from xblock.fragment import Fragment
@@ -35,7 +34,7 @@ from problem_builder.answer import AnswerBlock, AnswerRecapBlock
 from problem_builder.completion import CompletionBlock
 from problem_builder.mcq import MCQBlock, RatingBlock
 from problem_builder.mixins import (
-    EnumerableChildMixin, StepParentMixin, StudentViewUserStateMixin,
+    StepChildMixin, StepParentMixin, StudentViewUserStateMixin,
     StudentViewUserStateResultsTransformerMixin)
 from problem_builder.mrq import MRQBlock
 from problem_builder.plot import PlotBlock
@@ -75,7 +74,7 @@ class Correctness:
 @XBlock.needs('i18n')
 class MentoringStepBlock(
     StudioEditableXBlockMixin, StudioContainerWithNestedXBlocksMixin, XBlockWithPreviewMixin,
-    EnumerableChildMixin, StepParentMixin, StudentViewUserStateResultsTransformerMixin,
+    StepChildMixin, StepParentMixin, StudentViewUserStateResultsTransformerMixin,
     StudentViewUserStateMixin, XBlock, I18NService, TranslationContentMixin
 ):
     """
@@ -114,10 +113,6 @@ class MentoringStepBlock(
 
     editable_fields = ('display_name', 'show_title', 'next_button_label', 'message')
 
-    @lazy
-    def siblings(self):
-        return self.get_parent().step_ids
-
     @property
     def is_last_step(self):
         parent = self.get_parent()
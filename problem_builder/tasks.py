@@ -1,6 +1,7 @@
 """
 Celery task for CSV student answer export.
 """
+import re
 import time
 
 import six
@@ -38,7 +39,7 @@ def export_data(course_id, source_block_id_str, block_types, user_ids, match_str
     except InvalidKeyError:
         raise ValueError("Could not find the specified Block ID.")
 
-    src_block = modulestore().get_item(usage_key)
+    store = modulestore()
     course_key_str = six.text_type(course_key)
     type_map = {cls.__name__: cls for cls in [MCQBlock, MRQBlock, RatingBlock, AnswerBlock]}
 
@@ -54,36 +55,60 @@ def export_data(course_id, source_block_id_str, block_types, user_ids, match_str
         """ Recursively scan the course tree for blocks of interest """
         if isinstance(block, block_types):
             blocks_to_include.append(block)
-        elif block.has_children:
-            for child_id in block.children:
-                try:
-                    scan_for_blocks(block.runtime.get_block(child_id))
-                except ItemNotFoundError:
-                    # Blocks may refer to missing children. Don't break in this case.
-                    pass
-
-    scan_for_blocks(src_block)
-
-    # Define the header row of our CSV:
-    rows = []
-    rows.append(
-        ["Section", "Subsection", "Unit", "Type", "Question", "Answer", "Username", "User ID", "User E-mail"]
-    )
-
-    # Collect results for each block in blocks_to_include
-    for block in blocks_to_include:
-        if not user_ids:
-            results = _extract_data(course_key_str, block, None, match_string)
-            rows += results
-        else:
-            for user_id in user_ids:
-                results = _extract_data(course_key_str, block, user_id, match_string)
-                rows += results
+            return
+        # Leaves (most blocks in a course) have no children, or an empty list of them.
+        children = getattr(block, 'children', None)
+        if not children:
+            return
+        get_block = block.runtime.get_block
+        for child_id in children:
+            try:
+                child = get_block(child_id)
+            except ItemNotFoundError:
+                # Blocks may refer to missing children. Don't break in this case.
+                continue
+            scan_for_blocks(child)
+
+    with store.bulk_operations(course_key):
+        # Load the whole subtree in one go (depth=None), so that the scan below
+        # is served from the modulestore cache instead of fetching each child separately.
+        src_block = store.get_item(usage_key, depth=None)
+        scan_for_blocks(src_block)
+
+    # Collect results for each block in blocks_to_include.
+    # Students usually answer many of the blocks, and sibling blocks share the same
+    # section/subsection/unit, so share user info and context names across blocks.
+    users_cache = {}
+    context_cache = {}
+    display_data = []
+
+    # Compile the search string once for the whole export. A case-insensitive regex search
+    # avoids allocating a lowercased copy of every answer.
+    answer_matcher = re.compile(re.escape(match_string), re.IGNORECASE).search if match_string else None
+
+    def generate_rows():
+        """
+        Yield the rows of our CSV one block at a time, so that no list of every row is built up here.
+
+        Note that ReportStore.store_rows still writes all of the rows into an in-memory file before storing it,
+        so the memory needed by an export grows with its size. The first rows are also collected into
+        `display_data` as a preview.
+        """
+        # Define the header row of our CSV:
+        yield ["Section", "Subsection", "Unit", "Type", "Question", "Answer", "Username", "User ID", "User E-mail"]
+
+        for block in blocks_to_include:
+            for user_id in user_ids or [None]:
+                results = _extract_data(course_key_str, block, user_id, answer_matcher, users_cache, context_cache)
+                for row in results:
+                    if len(display_data) < 1000:  # Limit to preview of 1000 items
+                        display_data.append(row)
+                    yield row
 
     # Generate the CSV:
     filename = u"pb-data-export-{}.csv".format(time.strftime("%Y-%m-%d-%H%M%S", time.gmtime(start_timestamp)))
     report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
-    report_store.store_rows(course_key, filename, rows)
+    report_store.store_rows(course_key, filename, generate_rows())
 
     generation_time_s = time.time() - start_timestamp
     logger.debug("Done data export - took {} seconds".format(generation_time_s))
@@ -93,18 +118,23 @@ def export_data(course_id, source_block_id_str, block_types, user_ids, match_str
         "report_filename": filename,
         "start_timestamp": start_timestamp,
         "generation_time_s": generation_time_s,
-        "display_data": [] if len(rows) == 1 else rows[1:1001]  # Limit to preview of 1000 items
+        "display_data": display_data
     }
 
 
-def _extract_data(course_key_str, block, user_id, match_string):
+def _extract_data(course_key_str, block, user_id, answer_matcher, users_cache, context_cache):
     """
     Extract results for `block`.
+
+    If `answer_matcher` is given, only answers for which it returns a match are included.
+    `users_cache` maps anonymous student IDs to (username, user ID, e-mail) tuples,
+    and is shared across blocks so that each student is only looked up once.
+    `context_cache` is passed on to `_get_context`.
     """
     rows = []
 
     # Extract info for "Section", "Subsection", and "Unit" columns
-    section_name, subsection_name, unit_name = _get_context(block)
+    section_name, subsection_name, unit_name = _get_context(block, context_cache)
 
     # Extract info for "Type" column
     block_type = _get_type(block)
@@ -114,24 +144,21 @@ def _extract_data(course_key_str, block, user_id, match_string):
 
     # Extract info for "Answer" and "Username" columns
     # - Get all of the most recent student submissions for this block:
-    submissions = tuple(_get_submissions(course_key_str, block, user_id))
+    submissions = _get_submissions(course_key_str, block, user_id)
 
-    student_ids = [submission['student_id'] for submission in submissions]
-    users = get_users_by_anonymous_ids(student_ids)
+    # - Resolve choice labels once per block rather than once per submission:
+    display_map = _get_display_map(block)
 
-    # - For each submission, look up student's username, email and answer:
-    answer_cache = {}
-    for submission in submissions:
-        username, _user_id, user_email = users.get(
-            submission['student_id'],
-            (submission['student_id'], 'N/A', 'N/A')
-        )
-        answer = _get_answer(block, submission, answer_cache)
+    # - Look up each answer, keeping only those that match the search criteria:
+    answers = [(submission['student_id'], _get_answer(submission, display_map)) for submission in submissions]
+    if answer_matcher is not None:
+        answers = [(student_id, answer) for student_id, answer in answers if answer_matcher(answer)]
 
-        # Short-circuit if answer does not match search criteria
-        if not match_string.lower() in answer.lower():
-            continue
+    # - Look up username and email, only for students whose answers are included:
+    _update_users_cache(users_cache, {student_id for student_id, _answer in answers})
 
+    for student_id, answer in answers:
+        username, _user_id, user_email = users_cache[student_id]
         rows.append([
             section_name,
             subsection_name,
@@ -147,20 +174,26 @@ def _extract_data(course_key_str, block, user_id, match_string):
     return rows
 
 
-def _get_context(block):
+def _get_context(block, context_cache):
     """
     Return section, subsection, and unit names for `block`.
+
+    `context_cache` maps parent IDs to the names found for their children,
+    so the parent chain is only walked once for each set of sibling blocks.
     """
-    block_names_by_type = {}
-    block_iter = block
-    while block_iter:
-        block_iter_type = block_iter.scope_ids.block_type
-        block_names_by_type[block_iter_type] = block_iter.display_name_with_default
-        block_iter = block_iter.get_parent() if block_iter.parent else None
-    section_name = block_names_by_type.get('chapter', '')
-    subsection_name = block_names_by_type.get('sequential', '')
-    unit_name = block_names_by_type.get('vertical', '')
-    return section_name, subsection_name, unit_name
+    parent_id = block.parent
+    if parent_id not in context_cache:
+        block_names_by_type = {}
+        block_iter = block
+        while block_iter:
+            block_iter_type = block_iter.scope_ids.block_type
+            block_names_by_type[block_iter_type] = block_iter.display_name_with_default
+            block_iter = block_iter.get_parent() if block_iter.parent else None
+        section_name = block_names_by_type.get('chapter', '')
+        subsection_name = block_names_by_type.get('sequential', '')
+        unit_name = block_names_by_type.get('vertical', '')
+        context_cache[parent_id] = (section_name, subsection_name, unit_name)
+    return context_cache[parent_id]
 
 
 def _get_type(block):
@@ -219,16 +252,37 @@ def get_users_by_anonymous_ids(anonymous_ids):
     }
 
 
-def _get_answer(block, submission, answer_cache):
+def _update_users_cache(users_cache, student_ids):
     """
-    Return answer associated with `submission` to `block`.
+    Add user info for any of `student_ids` not yet in `users_cache`, using a single query.
 
-    `answer_cache` is a dict that is reset for each block.
+    Students without a matching user are cached too, so they are not looked up again.
+    """
+    missing_ids = student_ids.difference(users_cache)
+    if not missing_ids:
+        return
+    users = get_users_by_anonymous_ids(missing_ids)
+    for student_id in missing_ids:
+        users_cache[student_id] = users.get(student_id, (student_id, 'N/A', 'N/A'))
+
+
+def _get_display_map(block):
+    """
+    Return a dict mapping choice values of `block` to their human-readable labels.
+
+    Blocks without choices get an empty dict, so their answers are passed through unchanged.
     """
-    answer = submission['answer']
     if isinstance(block, QuestionnaireAbstractBlock):
-        # Convert from answer ID to answer label
-        if answer not in answer_cache:
-            answer_cache[answer] = block.get_submission_display(answer)
-        return answer_cache[answer]
-    return answer
+        return block.get_submission_display_map()
+    return {}
+
+
+def _get_answer(submission, display_map):
+    """
+    Return answer associated with `submission`.
+
+    `display_map` is returned by `_get_display_map` for the block the submission belongs to.
+    """
+    answer = submission['answer']
+    # Convert from answer ID to answer label
+    return display_map.get(answer, answer)
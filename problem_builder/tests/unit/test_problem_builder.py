@@ -1,9 +1,10 @@
 import unittest
-from random import random
+from contextlib import contextmanager
 
 import ddt
-from unittest.mock import MagicMock, Mock, PropertyMock, patch
+from unittest.mock import MagicMock, Mock, patch
 from xblock.field_data import DictFieldData
+from xblock.fields import ScopeIds
 from xblock.runtime import NullI18nService
 
 from problem_builder.answer import AnswerRecapBlock
@@ -14,6 +15,48 @@ from problem_builder.mrq import MRQBlock
 
 from .utils import BlockWithChildrenTestMixin
 
+# Immutable, so it can be shared by all blocks that don't care about their IDs
+SCOPE_IDS = ScopeIds('user', 'problem-builder', 'def_id', 'usage_id')
+
+# Blocks only write to their field data on save(), which none of these tests call, so blocks that
+# start out with no field values can share this; use DictFieldData(dict(...)) for anything that saves
+EMPTY_FIELD_DATA = DictFieldData({})
+
+MRQ_EXPECTED_KEYS = frozenset([
+    'hide_results', 'tips', 'block_id', 'display_name',
+    'weight', 'title', 'question', 'message', 'type', 'id', 'choices'
+])
+
+
+class StubRuntime:
+    """
+    Lightweight stand-in for the XBlock runtime, for tests that don't assert on runtime calls.
+
+    Much cheaper to create than a Mock; attributes needed by a test can be assigned directly.
+    """
+    def __init__(self, service=None):
+        self.service_instance = service
+
+    def service(self, _block, _service_name):
+        return self.service_instance
+
+
+@contextmanager
+def stub_runtime(block, **attrs):
+    """
+    Temporarily give `block` a runtime that is able to render it, with `attrs` set on it.
+
+    `runtime` is a plain instance attribute, so it is swapped directly rather than through patch.object().
+    """
+    original_runtime = block.runtime
+    runtime = MagicMock(**attrs)
+    runtime.service = lambda _, service: NullI18nService() if service == 'i18n' else MagicMock()
+    block.runtime = runtime
+    try:
+        yield runtime
+    finally:
+        block.runtime = original_runtime
+
 
 @ddt.ddt
 class TestMRQBlock(BlockWithChildrenTestMixin, unittest.TestCase):
@@ -21,15 +64,21 @@ class TestMRQBlock(BlockWithChildrenTestMixin, unittest.TestCase):
         """
         Ensure that all expected fields are always returned.
         """
-        block = MRQBlock(Mock(), DictFieldData({}), Mock())
+        block = MRQBlock(Mock(), EMPTY_FIELD_DATA, Mock())
 
-        self.assertEqual(
-            sorted(block.student_view_data().keys()),
-            sorted([
-                'hide_results', 'tips', 'block_id', 'display_name',
-                'weight', 'title', 'question', 'message', 'type', 'id', 'choices'
-            ])
-        )
+        self.assertEqual(frozenset(block.student_view_data()), MRQ_EXPECTED_KEYS)
+
+    def test_get_submission_display(self):
+        block = MRQBlock(Mock(), EMPTY_FIELD_DATA, Mock())
+        choices = [
+            Mock(value='a', content='Choice A'),
+            Mock(value='b', content='Choice B'),
+            Mock(value='a', content='Duplicate of choice A'),
+        ]
+        with patch.object(MRQBlock, 'custom_choices', choices):
+            self.assertEqual(block.get_submission_display_map(), {'a': 'Choice A', 'b': 'Choice B'})
+            self.assertEqual(block.get_submission_display('a'), 'Choice A')
+            self.assertEqual(block.get_submission_display('unknown'), 'unknown')
 
 
 @ddt.ddt
@@ -38,7 +87,7 @@ class TestAnswerRecapBlock(BlockWithChildrenTestMixin, unittest.TestCase):
         """
         Ensure that all expected fields are always returned.
         """
-        block = AnswerRecapBlock(Mock(), DictFieldData({}), Mock())
+        block = AnswerRecapBlock(Mock(), EMPTY_FIELD_DATA, Mock())
 
         self.assertEqual(
             sorted(block.student_view_data().keys()),
@@ -55,26 +104,20 @@ class TestMentoringBlock(BlockWithChildrenTestMixin, unittest.TestCase):
             'display_submit': False
         }), Mock())
 
-        with patch.object(block, 'runtime') as patched_runtime:
-            patched_runtime.publish = Mock()
-            patched_runtime.service = lambda _, service: NullI18nService() if service == 'i18n' else MagicMock()
-
+        with stub_runtime(block, publish=Mock()) as runtime:
             block.student_view(context={})
 
-            patched_runtime.publish.assert_called_once_with(block, 'progress', {})
+            runtime.publish.assert_called_once_with(block, 'progress', {})
 
     def test_does_not_send_progress_event_when_rendered_student_view_with_display_submit_true(self):
         block = MentoringBlock(MagicMock(), DictFieldData({
             'display_submit': True
         }), Mock())
 
-        with patch.object(block, 'runtime') as patched_runtime:
-            patched_runtime.publish = Mock()
-            patched_runtime.service = lambda _, service: NullI18nService() if service == 'i18n' else MagicMock()
-
+        with stub_runtime(block, publish=Mock()) as runtime:
             block.student_view(context={})
 
-            self.assertFalse(patched_runtime.publish.called)
+            self.assertFalse(runtime.publish.called)
 
     @ddt.data(True, False)
     def test_get_content_titles(self, has_title_set):
@@ -96,12 +139,7 @@ class TestMentoringBlock(BlockWithChildrenTestMixin, unittest.TestCase):
             'children': ['invalid_id'],
         }), Mock())
 
-        with patch.object(block, 'runtime') as patched_runtime:
-            patched_runtime.publish = Mock()
-            patched_runtime.service = lambda _, service: NullI18nService() if service == 'i18n' else MagicMock()
-            patched_runtime.get_block = lambda block_id: None
-            patched_runtime.load_block_type = lambda block_id: Mock
-
+        with stub_runtime(block, get_block=lambda block_id: None, load_block_type=lambda block_id: Mock):
             fragment = block.student_view(context={})
 
             self.assertIn('Unable to load child component', fragment.content)
@@ -109,7 +147,7 @@ class TestMentoringBlock(BlockWithChildrenTestMixin, unittest.TestCase):
     @ddt.data(
         (True, True, True),
         (True, False, False),
-        (False, False, True),
+        (False, True, True),
         (False, False, True),
     )
     @ddt.unpack
@@ -120,15 +158,14 @@ class TestMentoringBlock(BlockWithChildrenTestMixin, unittest.TestCase):
             'student_results': ['must', 'be', 'non-empty'],
         }), Mock())
         block.get_option = Mock(return_value=pb_hide_feedback_if_attempts_remain)
-        with patch(
-                'problem_builder.mentoring.MentoringBlock.max_attempts_reached', new_callable=PropertyMock
-        ) as patched_max_attempts_reached:
-            patched_max_attempts_reached.return_value = max_attempts_reached
+        # Replace the property with a plain value for the duration of the test
+        with patch.object(MentoringBlock, 'max_attempts_reached', max_attempts_reached):
             _, _, show_message = block._get_standard_results()
             self.assertEqual(show_message, expected_show_message)
+            block.get_option.assert_called_with('pb_hide_feedback_if_attempts_remain')
 
     def test_allowed_nested_blocks(self):
-        block = MentoringBlock(Mock(), DictFieldData({}), Mock())
+        block = MentoringBlock(Mock(), EMPTY_FIELD_DATA, Mock())
         self.assert_allowed_nested_blocks(block, message_blocks=[
                 'pb-message',  # Message type: "completed"
                 'pb-message',  # Message type: "incomplete"
@@ -178,108 +215,126 @@ class TestMentoringBlock(BlockWithChildrenTestMixin, unittest.TestCase):
 
 @ddt.ddt
 class TestMentoringBlockOptions(unittest.TestCase):
-    def setUp(self):
-        self.service_mock = Mock()
-        self.runtime_mock = Mock()
-        self.runtime_mock.service = Mock(return_value=self.service_mock)
-        self.block = MentoringBlock(self.runtime_mock, DictFieldData({}), Mock())
+    """
+    Tests for the options of MentoringBlock.
+
+    The block is shared by all tests in this class, so tests must only change it through
+    patch.object(), which reverts the change when the test is done.
+    """
+    DEFAULT_OPTIONS = _default_options_config
+    OPTIONS_KEY = MentoringBlock.options_key
+    # Sentinels for an option the block knows nothing about
+    CUSTOM_OPTION_KEY = object()
+    CUSTOM_OPTION_VALUE = object()
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestMentoringBlockOptions, cls).setUpClass()
+        cls.runtime = StubRuntime(service=Mock())
+        cls.block = MentoringBlock(cls.runtime, EMPTY_FIELD_DATA, SCOPE_IDS)
 
     def test_get_options_returns_default_if_settings_service_is_not_available(self):
-        self.runtime_mock.service = Mock(return_value=None)
-        self.assertEqual(self.block.get_options(), _default_options_config)
+        with patch.object(self.runtime, 'service_instance', None):
+            self.assertEqual(self.block.get_options(), self.DEFAULT_OPTIONS)
 
     def test_get_options_returns_default_if_xblock_settings_not_customized(self):
-        self.block.get_xblock_settings = Mock(return_value=None)
-        self.assertEqual(self.block.get_options(), _default_options_config)
-        self.block.get_xblock_settings.assert_called_once_with(default={})
+        with patch.object(self.block, 'get_xblock_settings', return_value=None) as patched_settings:
+            self.assertEqual(self.block.get_options(), self.DEFAULT_OPTIONS)
+            patched_settings.assert_called_once_with(default={})
 
-    @ddt.data(
-        {}, {'mass': 123}, {'spin': {}}, {'parity': "1"}
-    )
-    def test_get_options_returns_default_if_options_not_customized(self, xblock_settings):
-        self.block.get_xblock_settings = Mock(return_value=xblock_settings)
-        self.assertEqual(self.block.get_options(), _default_options_config)
-        self.block.get_xblock_settings.assert_called_once_with(default={})
+    def test_get_options_returns_default_if_options_not_customized(self):
+        with patch.object(self.block, 'get_xblock_settings', return_value={'unrelated': 1}) as patched_settings:
+            self.assertEqual(self.block.get_options(), self.DEFAULT_OPTIONS)
+            patched_settings.assert_called_once_with(default={})
 
     @ddt.data(
-        {MentoringBlock.options_key: 123},
-        {MentoringBlock.options_key: [1, 2, 3]},
-        {MentoringBlock.options_key: {'pb_mcq_hide_previous_answer': False}},
+        {OPTIONS_KEY: 123},
+        {OPTIONS_KEY: [1, 2, 3]},
+        {OPTIONS_KEY: {'pb_mcq_hide_previous_answer': False}},
      )
     def test_get_options_correctly_returns_customized_options(self, xblock_settings):
-        self.block.get_xblock_settings = Mock(return_value=xblock_settings)
-        self.assertEqual(self.block.get_options(), xblock_settings[MentoringBlock.options_key])
-        self.block.get_xblock_settings.assert_called_once_with(default={})
+        with patch.object(self.block, 'get_xblock_settings', return_value=xblock_settings) as patched_settings:
+            self.assertEqual(self.block.get_options(), xblock_settings[self.OPTIONS_KEY])
+            patched_settings.assert_called_once_with(default={})
 
     def test_get_option(self):
-        random_key, random_value = random(), random()
         with patch.object(self.block, 'get_options') as patched_get_options:
             # Happy path: Customizations contain expected key
-            patched_get_options.return_value = {random_key: random_value}
-            option = self.block.get_option(random_key)
+            patched_get_options.return_value = {self.CUSTOM_OPTION_KEY: self.CUSTOM_OPTION_VALUE}
+            option = self.block.get_option(self.CUSTOM_OPTION_KEY)
             patched_get_options.assert_called_once_with()
-            self.assertEqual(option, random_value)
+            self.assertIs(option, self.CUSTOM_OPTION_VALUE)
         with patch.object(self.block, 'get_options') as patched_get_options:
             # Sad path: Customizations do not contain expected key
             patched_get_options.return_value = {}
-            option = self.block.get_option(random_key)
+            option = self.block.get_option(self.CUSTOM_OPTION_KEY)
             patched_get_options.assert_called_once_with()
             self.assertEqual(option, None)
 
     def test_student_view_calls_get_option(self):
-        random_key, random_value = random(), random()
-        self.block.get_xblock_settings = Mock(return_value={})
-        with patch.object(self.block, 'get_option') as patched_get_option:
-            self.runtime_mock.service.return_value = {
-                random_key: random_value,
+        # Rendering needs a fully featured runtime
+        runtime_mock = Mock()
+        block = MentoringBlock(runtime_mock, EMPTY_FIELD_DATA, Mock())
+        block.get_xblock_settings = Mock(return_value={})
+        with patch.object(block, 'get_option') as patched_get_option:
+            runtime_mock.service.return_value = {
+                self.CUSTOM_OPTION_KEY: self.CUSTOM_OPTION_VALUE,
             }
-            self.block.student_view({})
+            block.student_view({})
             patched_get_option.assert_any_call('pb_mcq_hide_previous_answer')
             patched_get_option.assert_any_call('pb_hide_feedback_if_attempts_remain')
 
-    def test_get_standard_results_calls_get_option(self):
-        with patch.object(self.block, 'get_option') as patched_get_option:
-            self.block._get_standard_results()
-            patched_get_option.assert_called_with('pb_hide_feedback_if_attempts_remain')
-
 
 class TestMentoringBlockJumpToIds(unittest.TestCase):
+    """
+    Tests for replacing jump_to_id URLs in the content shown by MentoringBlock.
+
+    The message and MCQ blocks are shared by all tests in this class; the mentoring block is
+    rebuilt for each test, since its lazily computed steps and messages depend on the test.
+    Every child is treated as a message block.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(TestMentoringBlockJumpToIds, cls).setUpClass()
+        child_runtime = StubRuntime(service=Mock())
+        cls.message_block = MentoringMessageBlock(
+            child_runtime, DictFieldData({'type': 'bogus', 'content': 'test'}), SCOPE_IDS
+        )
+        cls.mcq_block = MCQBlock(child_runtime, DictFieldData({'name': 'test_mcq'}), SCOPE_IDS)
+        # Started last, so that it can't leak into other test classes if anything above raises
+        cls.child_isinstance_patcher = patch('problem_builder.mixins.child_isinstance', return_value=True)
+        cls.child_isinstance_patcher.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.child_isinstance_patcher.stop()
+        super(TestMentoringBlockJumpToIds, cls).tearDownClass()
+
     def setUp(self):
-        self.service_mock = Mock()
-        self.runtime_mock = Mock()
-        self.runtime_mock.service = Mock(return_value=self.service_mock)
-        self.block = MentoringBlock(self.runtime_mock, DictFieldData({}), Mock())
+        self.runtime = StubRuntime(service=Mock())
+        self.block = MentoringBlock(self.runtime, EMPTY_FIELD_DATA, SCOPE_IDS)
         self.block.children = ['dummy_id']
-        self.message_block = MentoringMessageBlock(
-            self.runtime_mock, DictFieldData({'type': 'bogus', 'content': 'test'}), Mock()
-        )
         self.block.runtime.replace_jump_to_id_urls = lambda x: x.replace('test', 'replaced-url')
 
     def test_get_message_content(self):
-        with patch('problem_builder.mixins.child_isinstance') as mock_child_isinstance:
-            mock_child_isinstance.return_value = True
-            self.runtime_mock.get_block = Mock()
-            self.runtime_mock.get_block.return_value = self.message_block
-            self.assertEqual(self.block.get_message_content('bogus'), 'replaced-url')
+        self.runtime.get_block = Mock()
+        self.runtime.get_block.return_value = self.message_block
+        self.assertEqual(self.block.get_message_content('bogus'), 'replaced-url')
 
     def test_get_tip_content(self):
-        self.mcq_block = MCQBlock(self.runtime_mock, DictFieldData({'name': 'test_mcq'}), Mock())
-        self.mcq_block.get_review_tip = Mock()
-        self.mcq_block.get_review_tip.return_value = self.message_block.content
-        self.assertEqual(self.block.review_tips, [])
+        with patch.object(self.mcq_block, 'get_review_tip', return_value=self.message_block.content):
+            self.assertEqual(self.block.review_tips, [])
 
     def test_get_tip_content_no_tips(self):
-        self.mcq_block = MCQBlock(self.runtime_mock, DictFieldData({'name': 'test_mcq'}), Mock())
-        self.mcq_block.get_review_tip = Mock()
-        # If there are no review tips, get_review_tip will return None;
-        # simulate this situation here:
-        self.mcq_block.get_review_tip.return_value = None
         self.block.step_ids = []
         self.block.steps = [self.mcq_block]
         self.block.student_results = {'test_mcq': {'status': 'incorrect'}}
-        try:
-            review_tips = self.block.review_tips
-        except TypeError:
-            self.fail('Trying to replace jump_to_id URLs in non-existent review tips.')
-        else:
-            self.assertEqual(review_tips, [])
+        # If there are no review tips, get_review_tip will return None;
+        # simulate this situation here:
+        with patch.object(self.mcq_block, 'get_review_tip', return_value=None):
+            try:
+                review_tips = self.block.review_tips
+            except TypeError:
+                self.fail('Trying to replace jump_to_id URLs in non-existent review tips.')
+            else:
+                self.assertEqual(review_tips, [])
@@ -78,6 +78,30 @@ class TestQuestionMixin(unittest.TestCase):
         self.assertEquals(step1.step_number, 2)
         self.assertEquals(step2.step_number, 1)
 
+    def test_step_number_raises_if_parent_does_not_contain_step(self):
+        block = Parent()
+        step1 = Step()
+        block._set_children_for_test(step1)
+        orphan = Step()
+        orphan.get_parent = lambda: block
+        orphan.scope_ids = Mock(usage_id=1)
+
+        with self.assertRaises(ValueError):
+            orphan.step_number  # pylint: disable=pointless-statement
+        with self.assertRaises(ValueError):
+            orphan.lonely_child  # pylint: disable=pointless-statement
+
+    def test_step_listed_twice_is_numbered_by_its_first_position(self):
+        block = Parent()
+        step1 = Step()
+        step2 = Step()
+        block._set_children_for_test(step1, step2)
+        block.step_ids = [0, 1, 0]
+
+        self.assertEqual(step1.step_number, 1)
+        self.assertEqual(step2.step_number, 2)
+        self.assertFalse(step1.lonely_child)
+
     def test_lonely_child_is_true_for_stand_alone_steps(self):
         block = Parent()
         step1 = Step()
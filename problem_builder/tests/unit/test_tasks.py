@@ -0,0 +1,168 @@
+"""
+Unit tests for the student answer export task
+"""
+import unittest
+from sys import modules
+
+from unittest.mock import MagicMock, Mock, patch
+# Real modules used by problem_builder.tasks must be imported before it is, so they aren't
+# dropped from sys.modules along with the fake ones and then loaded a second time.
+import opaque_keys.edx.keys  # pylint: disable=unused-import
+
+from problem_builder.answer import AnswerBlock
+from problem_builder.mcq import MCQBlock
+
+
+class ItemNotFoundError(Exception):
+    """ Stand-in for the modulestore's ItemNotFoundError """
+
+
+def import_tasks_module():
+    """
+    Import problem_builder.tasks, faking the edx-platform and Celery modules it depends on.
+    """
+    celery_task_mock = Mock(task=lambda: lambda func: func)
+    fake_modules = {
+        'celery': Mock(),
+        'celery.task': celery_task_mock,
+        'celery.utils': Mock(),
+        'celery.utils.log': Mock(),
+        'lms': Mock(),
+        'lms.djangoapps': Mock(),
+        'lms.djangoapps.instructor_task': Mock(),
+        'lms.djangoapps.instructor_task.models': Mock(),
+        'xmodule': Mock(),
+        'xmodule.modulestore': Mock(),
+        'xmodule.modulestore.django': Mock(),
+        'xmodule.modulestore.exceptions': Mock(ItemNotFoundError=ItemNotFoundError),
+    }
+    with patch.dict(modules, fake_modules):
+        modules.pop('problem_builder.tasks', None)
+        from problem_builder import tasks
+    return tasks
+
+
+class TestExportData(unittest.TestCase):
+    """
+    Test the export_data task against a stubbed modulestore, submissions API and report store.
+    """
+    COURSE_ID = 'course-v1:edX+DemoX+Demo_Course'
+    UNIT_ID = 'block-v1:edX+DemoX+Demo_Course+type@vertical+block@unit'
+    HEADER = ["Section", "Subsection", "Unit", "Type", "Question", "Answer", "Username", "User ID", "User E-mail"]
+    EXPECTED_ROWS = [
+        ['', '', 'Unit', 'pb-mcq', 'Which one?', 'Choice A', 'Alice', 1, 'alice@example.com'],
+        ['', '', 'Unit', 'pb-mcq', 'Which one?', 'Choice B', 'Bob', 2, 'bob@example.com'],
+        ['', '', 'Unit', 'pb-answer', 'answer_1', 'A long answer', 'Alice', 1, 'alice@example.com'],
+        ['', '', 'Unit', 'pb-answer', 'answer_1', 'Another long answer', 'unknown', 'N/A', 'N/A'],
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestExportData, cls).setUpClass()
+        cls.tasks = import_tasks_module()
+
+    def setUp(self):
+        unit = Mock(display_name_with_default='Unit', children=['mcq', 'missing', 'html', 'answer'])
+        unit.scope_ids.block_type = 'vertical'
+        unit.parent = None  # Not passed to Mock(), see _make_block()
+        mcq = self._make_block(MCQBlock, 'pb-mcq', unit, name='mcq_1', question='Which one?')
+        mcq.get_submission_display_map.return_value = {'a': 'Choice A', 'b': 'Choice B'}
+        html = Mock(children=[])
+        html.scope_ids.block_type = 'html'
+        answer = self._make_block(AnswerBlock, 'pb-answer', unit, name='answer_1', question='')
+        children = {'mcq': mcq, 'html': html, 'answer': answer}
+
+        def get_block(block_id):
+            try:
+                return children[block_id]
+            except KeyError:
+                raise ItemNotFoundError(block_id)
+        unit.runtime.get_block = get_block
+
+        self.store = MagicMock()
+        self.store.get_item.return_value = unit
+
+        self.submissions = {
+            'mcq_id': [
+                {'student_id': 'student_1', 'answer': 'a'},
+                {'student_id': 'student_2', 'answer': 'b'},
+            ],
+            'answer_1': [
+                {'student_id': 'student_1', 'answer': 'A long answer'},
+                {'student_id': 'unknown', 'answer': 'Another long answer'},
+            ],
+        }
+        self.sub_api = Mock()
+        self.sub_api.get_all_submissions.side_effect = (
+            lambda course_id, block_id, block_type: self.submissions[block_id]
+        )
+
+        self.users = {
+            'student_1': ('Alice', 1, 'alice@example.com'),
+            'student_2': ('Bob', 2, 'bob@example.com'),
+        }
+        self.get_users = Mock(side_effect=lambda ids: {sid: self.users[sid] for sid in ids if sid in self.users})
+
+        self.stored_rows = []
+        self.report_store = Mock()
+        self.report_store.store_rows.side_effect = lambda course_key, filename, rows: self.stored_rows.extend(rows)
+
+    @staticmethod
+    def _make_block(block_class, block_type, parent, name, question):
+        scope_ids = Mock(block_type=block_type)
+        scope_ids.usage_id.replace.return_value = block_type.replace('pb-', '') + '_id'
+        block = Mock(spec=block_class, scope_ids=scope_ids, get_parent=lambda: parent, question=question)
+        # Mock() has 'name' and 'parent' arguments of its own, so these must be set afterwards
+        block.name = name
+        block.parent = 'unit'
+        return block
+
+    def export(self, match_string=''):
+        with patch.object(self.tasks, 'modulestore', return_value=self.store), \
+                patch.object(self.tasks, 'sub_api', self.sub_api), \
+                patch.object(self.tasks, 'get_users_by_anonymous_ids', self.get_users), \
+                patch.object(self.tasks.ReportStore, 'from_config', return_value=self.report_store):
+            return self.tasks.export_data(self.COURSE_ID, self.UNIT_ID, [], [], match_string)
+
+    def test_export_data(self):
+        """
+        Answers to questions with choices are exported with the label of the chosen choice.
+        """
+        self.export()
+
+        self.assertEqual(self.stored_rows, [self.HEADER] + self.EXPECTED_ROWS)
+
+    def test_each_student_is_looked_up_once(self):
+        self.export()
+
+        # student_1 answered both blocks, but is only looked up for the first one
+        self.assertEqual(
+            [call_args[0][0] for call_args in self.get_users.call_args_list],
+            [{'student_1', 'student_2'}, {'unknown'}]
+        )
+
+    def test_display_data(self):
+        self.submissions['answer_1'] = [
+            {'student_id': 'student_1', 'answer': 'Answer {}'.format(i)} for i in range(1000)
+        ]
+
+        result = self.export()
+
+        self.assertEqual(len(self.stored_rows), 1003)
+        self.assertEqual(result['display_data'], self.stored_rows[1:1001])
+
+    def test_match_string(self):
+        result = self.export(match_string='LONG')
+
+        self.assertEqual(self.stored_rows, [self.HEADER] + self.EXPECTED_ROWS[2:])
+        self.assertEqual(result['display_data'], self.EXPECTED_ROWS[2:])
+        # Students whose answers don't match are not looked up
+        self.assertEqual(
+            [call_args[0][0] for call_args in self.get_users.call_args_list],
+            [{'student_1', 'unknown'}]
+        )
+
+    def test_match_string_is_not_a_pattern(self):
+        self.export(match_string='.*')
+
+        self.assertEqual(self.stored_rows, [self.HEADER])
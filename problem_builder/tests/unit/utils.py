@@ -1,12 +1,11 @@
 """
 Helper methods for testing Problem Builder / Step Builder blocks
 """
-import json
-from datetime import date, datetime
-
 from unittest.mock import MagicMock, Mock, patch
 from xblock.field_data import DictFieldData
 
+from problem_builder.utils import DateTimeEncoder  # pylint: disable=unused-import
+
 
 class ScoresTestMixin:
     """
@@ -92,11 +91,3 @@ def instantiate_block(cls, fields=None):
     block.children = children
     block.runtime.get_block = lambda child_id: children[child_id]
     return block
-
-
-class DateTimeEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, (datetime, date)):
-            return o.isoformat()
-
-        return json.JSONEncoder.default(self, o)
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 #
+import json
+from datetime import date, datetime
 
 
 # Make '_' a no-op so we can scrape strings
@@ -32,3 +34,14 @@ class I18NService:
     def i18n_service(self):
         """ Obtains translation service """
         return self.runtime.service(self, "i18n") or DummyTranslationService()
+
+
+class DateTimeEncoder(json.JSONEncoder):
+    """
+    JSON encoder that serializes dates and datetimes in ISO 8601 format
+    """
+    def default(self, o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+
+        return json.JSONEncoder.default(self, o)